@@ -1,18 +1,50 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import os
-from github import Github, GithubException
+import time
+import uuid
+import atexit
+from collections import deque
+import requests
 import io
+import base64
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
 # --------------------------------------------------------------------------------
 # 1. 시스템 설정 및 초기화
 # --------------------------------------------------------------------------------
 st.set_page_config(page_title="인하대 출판부 재고 관리", layout="wide", page_icon="📚")
 
-# 파일 경로 설정
+# GitHub REST API 주소
+GITHUB_API = "https://api.github.com"
+# GitHub 요청 제한 시간(초) - 연결이 멈춰도 화면과 동기화 스레드가 무한정 기다리지 않도록
+GITHUB_TIMEOUT = 15
+
+# 파일 경로 설정 (CSV는 GitHub 동기화용, Parquet은 로컬 작업용)
 INVENTORY_FILE = '출판부_재고자산.csv'
+INVENTORY_PARQUET = '출판부_재고자산.parquet'
+# 거래 기록은 덧붙이기만 합니다.
+# 로컬: HISTORY_FILE 끝에 새 거래 추가 / GitHub: 월별 파일(history/YYYY-MM.csv) 중 해당 월만 갱신
+# (GitHub의 기존 HISTORY_FILE은 더 이상 수정하지 않고 읽기만 함)
 HISTORY_FILE = '거래기록.csv'
+HISTORY_DIR = 'history'
+# GitHub 동기화 최소 간격(초) - 그 사이의 거래는 모아서 한 번에 커밋
+SYNC_INTERVAL = 5
+
+# 거래 기록 화면에 표시할 최대 행 수 (최신순)
+HISTORY_DISPLAY_ROWS = 500
+
+HISTORY_COLUMNS = ['일시', '거래처', '책 이름', '구분', '수량', '가격']
+
+# 로드 시 컬럼 타입 지정 (메모리 절약 및 연산 속도 향상, 반복되는 문자열은 category)
+# GitHub에서 직접 수정하다 생긴 빈 칸도 읽을 수 있도록 정수는 결측값을 허용하는 Int 타입 사용
+INVENTORY_DTYPES = {
+    '책 이름': 'category', '가격': 'Int32', 'ISBN': 'string', '현재 수량': 'Int32', '안전 재고': 'Int16'
+}
+HISTORY_DTYPES = {'거래처': 'category', '책 이름': 'category', '구분': 'category', '수량': 'Int32', '가격': 'Int32'}
 
 # GitHub 설정 (secrets.toml에서 로드)
 # 로컬 개발 환경에서는 .streamlit/secrets.toml 파일이 필요합니다.
@@ -37,106 +69,434 @@ else:
 # --------------------------------------------------------------------------------
 # 2. 데이터 핸들링 함수 (GitHub 양방향 동기화)
 # --------------------------------------------------------------------------------
-def get_github_repo():
-    """GitHub 리포지토리 객체를 가져옵니다."""
-    if not GITHUB_TOKEN or not REPO_NAME:
+@st.cache_resource(show_spinner=False)
+def get_github_session(token, repo_name):
+    """
+    GitHub REST API 호출용 세션을 가져옵니다.
+    연결(keep-alive)을 재사용하도록 리런 간에 캐시하며, 토큰이나 저장소 이름이 바뀌면 새로 생성됩니다.
+    """
+    if not token or not repo_name:
+        return None
+    session = requests.Session()
+    session.headers.update({
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+    })
+    return session
+
+
+def contents_url(path=""):
+    """Contents API의 파일(또는 폴더) 주소를 만듭니다."""
+    return f"{GITHUB_API}/repos/{REPO_NAME}/contents/{quote(path)}"
+
+
+def history_path(month):
+    """월(YYYY-MM)별 거래 기록 파일의 경로를 만듭니다."""
+    return f"{HISTORY_DIR}/{month}.csv"
+
+
+def _list_folder(session, folder="", etag=None):
+    """
+    폴더의 파일 목록을 조회합니다.
+    etag를 주면 조건부 요청(If-None-Match)을 보내, 변경이 없을 때는 본문 없이 304 응답을 받습니다.
+    """
+    headers = {"If-None-Match": etag} if etag else None
+    return session.get(contents_url(folder), headers=headers, timeout=GITHUB_TIMEOUT)
+
+
+def _listing_shas(response):
+    """파일 목록 응답을 경로별 SHA dict로 바꿉니다. (폴더가 없으면 빈 dict)"""
+    if response.status_code == 404:
+        return {}
+    response.raise_for_status()
+    return {item['path']: item['sha'] for item in response.json() if item['type'] == 'file'}
+
+
+def get_remote_shas(session, folder=""):
+    """폴더의 파일 목록을 조회해 경로별 SHA를 반환합니다. (파일 본문은 받지 않으며, 폴더가 없으면 빈 dict)"""
+    return _listing_shas(_list_folder(session, folder))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_blob(sha):
+    """
+    GitHub에서 파일 내용(blob)을 바이트로 내려받습니다.
+    같은 SHA는 같은 내용이므로 SHA를 캐시 키로 삼아, 변경되지 않은 파일은 다시 받지 않습니다.
+    """
+    session = get_github_session(GITHUB_TOKEN, REPO_NAME)
+    response = session.get(f"{GITHUB_API}/repos/{REPO_NAME}/git/blobs/{sha}", timeout=GITHUB_TIMEOUT)
+    response.raise_for_status()
+    return base64.b64decode(response.json()['content'])
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_csv(path, sha, dtype=None):
+    """GitHub의 CSV 파일을 DataFrame으로 반환합니다. (path, sha)가 같으면 캐시된 결과를 사용합니다."""
+    return pd.read_csv(io.BytesIO(_fetch_blob(sha)), dtype=dtype)
+
+
+def get_file_sha(session, path):
+    """
+    파일의 현재 SHA를 조회합니다. 파일이 없으면 None을 반환합니다.
+    (Contents API는 1MB가 넘는 파일의 content를 비워 보내므로, 내용은 _fetch_blob(sha)로 받음)
+    """
+    response = session.get(contents_url(path), timeout=GITHUB_TIMEOUT)
+    if response.status_code == 404:
         return None
-    g = Github(GITHUB_TOKEN)
-    return g.get_repo(REPO_NAME)
+    response.raise_for_status()
+    return response.json()['sha']
+
+
+def _csv_bytes(df, header=True):
+    """DataFrame을 UTF-8 CSV 바이트로 만듭니다. (전체 문자열을 거치지 않고 버퍼에 바로 기록)"""
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, header=header, encoding='utf-8')
+    return buffer.getvalue()
+
+
+def _put_contents(session, path, name, content, sha):
+    """Contents API로 파일(바이트)을 업로드(PUT)합니다. sha가 있으면 갱신, 없으면 생성합니다."""
+    payload = {
+        "message": f"{'Update' if sha else 'Create'} {name} (App)",
+        "content": base64.b64encode(content).decode('ascii'),
+    }
+    if sha:
+        payload["sha"] = sha
+    return session.put(contents_url(path), json=payload, timeout=GITHUB_TIMEOUT)
+
+
+def put_file(session, path, name, content, sha=None):
+    """
+    파일 전체를 GitHub에 업로드하고 새 SHA를 반환합니다.
+    저장해 둔 SHA가 원격과 다르면(충돌) 최신 SHA를 다시 조회해 한 번 더 시도합니다.
+    """
+    response = _put_contents(session, path, name, content, sha)
+    if response.status_code in (409, 422):  # SHA 불일치 또는 SHA 누락
+        response = _put_contents(session, path, name, content, get_file_sha(session, path))
+    response.raise_for_status()
+    return response.json()['content']['sha']
+
+
+def _append_csv(data, rows):
+    """CSV 바이트 끝에 행을 덧붙입니다. (빈 파일이면 헤더 포함)"""
+    if data and not data.endswith(b'\n'):
+        data += b'\n'
+    return data + _csv_bytes(rows, header=not data)
 
 
-def load_data():
+def append_file(session, path, name, rows, sha=None):
+    """
+    GitHub의 CSV 파일 끝에 행을 덧붙여 업로드하고 새 SHA를 반환합니다.
+    기존 내용은 SHA로 캐시된 것을 사용하며, 충돌 시 최신 내용을 다시 받아 그 뒤에 덧붙입니다.
+    """
+    data = _fetch_blob(sha) if sha else b''
+    response = _put_contents(session, path, name, _append_csv(data, rows), sha)
+    if response.status_code in (409, 422):  # 다른 곳에서 먼저 수정됨
+        sha = get_file_sha(session, path)
+        data = _fetch_blob(sha) if sha else b''
+        response = _put_contents(session, path, name, _append_csv(data, rows), sha)
+    response.raise_for_status()
+    return response.json()['content']['sha']
+
+
+def load_data(refresh=False):
     """
     데이터를 로드합니다.
     우선순위: GitHub에서 최신 파일 다운로드 -> 실패 시 로컬 파일 로드 -> 없으면 빈 파일 생성
+    refresh=True이면 마지막 로드 때의 ETag로 조건부 요청을 보내, GitHub의 파일 목록이 그대로이면(304)
+    아무것도 다시 받지 않고 None을 반환합니다.
     """
     df_inv = None
     df_hist = None
-    repo = get_github_repo()
+    session = get_github_session(GITHUB_TOKEN, REPO_NAME)
 
     # 1. GitHub에서 데이터 불러오기 시도
-    if repo:
+    if session:
         try:
-            # 인벤토리 파일
-            try:
-                contents_inv = repo.get_contents(INVENTORY_FILE)
-                df_inv = pd.read_csv(io.StringIO(contents_inv.decoded_content.decode('utf-8')))
-            except:
-                pass  # 파일이 없으면 패스
-
-            # 거래 기록 파일
-            try:
-                contents_hist = repo.get_contents(HISTORY_FILE)
-                df_hist = pd.read_csv(io.StringIO(contents_hist.decoded_content.decode('utf-8')))
-            except:
-                pass
+            # 루트와 월별 기록 폴더의 파일 목록으로 SHA 확인 (저장 시 재사용)
+            etags = st.session_state.get('etags', {}) if refresh else {}
+            responses = {folder: _list_folder(session, folder, etags.get(folder)) for folder in ("", HISTORY_DIR)}
+            if all(response.status_code == 304 for response in responses.values()):
+                return None  # 변경 없음
+            for folder, response in responses.items():
+                if response.status_code == 304:  # 한쪽만 바뀐 경우 나머지 목록은 다시 받음
+                    responses[folder] = _list_folder(session, folder)
+            shas = {}
+            for response in responses.values():
+                shas.update(_listing_shas(response))
+            st.session_state['file_shas'] = shas
+
+            # 인벤토리와 거래 기록(기존 단일 파일 + 월별 파일)을 동시에 다운로드
+            history_paths = sorted(p for p in shas if p == HISTORY_FILE or p.startswith(f"{HISTORY_DIR}/"))
+            frames = {}
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = {
+                    executor.submit(
+                        _fetch_csv, path, shas[path], INVENTORY_DTYPES if path == INVENTORY_FILE else HISTORY_DTYPES
+                    ): path
+                    for path in [INVENTORY_FILE, *history_paths] if path in shas
+                }
+                for future in as_completed(futures):
+                    try:
+                        frames[futures[future]] = future.result()
+                    except:
+                        pass  # 받지 못한 파일은 로컬에서 불러옴
+
+            df_inv = frames.get(INVENTORY_FILE)
+            # 월별 파일 중 하나라도 받지 못하면 일부만 보여주지 않도록 로컬 기록 사용
+            if history_paths and all(path in frames for path in history_paths):
+                # 파일마다 category 값이 달라 concat 후 다시 지정
+                df_hist = pd.concat([frames[path] for path in history_paths], ignore_index=True).astype(HISTORY_DTYPES)
+
+            # 모두 GitHub에서 받았을 때만 다음 새로고침의 조건부 요청용 ETag 저장
+            if df_inv is not None and df_hist is not None:
+                st.session_state['etags'] = {
+                    folder: response.headers.get('ETag') for folder, response in responses.items()
+                }
         except Exception as e:
             st.error(f"GitHub 연결 오류: {e}")
 
     # 2. GitHub에 없거나 로드 실패 시, 로컬 확인 또는 초기화
     if df_inv is None:
-        if os.path.exists(INVENTORY_FILE):
-            df_inv = pd.read_csv(INVENTORY_FILE)
+        if os.path.exists(INVENTORY_PARQUET):
+            df_inv = pd.read_parquet(INVENTORY_PARQUET)
+        elif os.path.exists(INVENTORY_FILE):
+            df_inv = pd.read_csv(INVENTORY_FILE, dtype=INVENTORY_DTYPES)
         else:
             # 초기 데이터 생성
             df_inv = pd.DataFrame(columns=['책 이름', '가격', 'ISBN', '현재 수량', '안전 재고'])
             # 예시 데이터
             df_inv.loc[0] = ['인하의 역사', 15000, '979-11-87', 50, 10]
             df_inv.loc[1] = ['파이썬 정복', 25000, '979-11-99', 5, 10]
+            df_inv = df_inv.astype(INVENTORY_DTYPES)
 
     if df_hist is None:
         if os.path.exists(HISTORY_FILE):
-            df_hist = pd.read_csv(HISTORY_FILE)
+            df_hist = pd.read_csv(HISTORY_FILE, dtype=HISTORY_DTYPES)
         else:
-            df_hist = pd.DataFrame(columns=['일시', '거래처', '책 이름', '구분', '수량', '가격'])
+            df_hist = pd.DataFrame(columns=HISTORY_COLUMNS).astype(HISTORY_DTYPES)
+
+    # 일시는 datetime으로 변환하고, 최신순 정렬은 로드 시 한 번만 수행 (이후 새 기록은 맨 앞에 추가)
+    df_hist['일시'] = pd.to_datetime(df_hist['일시'], format='ISO8601')
+    df_hist = df_hist.sort_values('일시', ascending=False, kind='stable', ignore_index=True)
 
     return df_inv, df_hist
 
 
-def save_data(df_inv, df_hist):
+@st.cache_resource(show_spinner=False)
+def get_sync_executor():
+    """
+    GitHub 동기화를 실행할 백그라운드 스레드를 가져옵니다.
+    작업자를 하나만 두어 모든 세션의 저장이 제출된 순서대로 반영되도록 합니다.
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='github-sync')
+
+
+def sync_github(session, df_inv, new_records, shas, synced_months=None):
+    """
+    변경 사항을 GitHub에 Push합니다.
+    백그라운드 스레드에서 실행되므로 화면에 직접 표시하지 않고, 실패는 예외로 전달합니다.
+    shas(경로별 SHA)는 저장 후 새 값으로 갱신되고, 기록을 덧붙인 월은 synced_months에 추가됩니다.
+    (중간에 실패하면 호출한 쪽이 아직 반영되지 않은 월의 기록만 다시 쌓을 수 있도록)
+    """
+    months = new_records['일시'].dt.strftime('%Y-%m')
+    history_paths = [history_path(month) for month in months.unique()]
+
+    # 마지막 로드/저장 때 받은 SHA를 재사용하고, 모를 때만 파일 목록을 조회
+    if any(path not in shas for path in [INVENTORY_FILE, *history_paths]):
+        shas.update(get_remote_shas(session))
+        shas.update(get_remote_shas(session, HISTORY_DIR))
+
+    # 인벤토리 업데이트
+    shas[INVENTORY_FILE] = put_file(
+        session, INVENTORY_FILE, "Inventory", _csv_bytes(df_inv), shas.get(INVENTORY_FILE)
+    )
+
+    # 거래 기록 업데이트 (해당 월 파일에만 덧붙임)
+    for month, rows in new_records.groupby(months):
+        path = history_path(month)
+        shas[path] = append_file(session, path, f"History {month}", rows, shas.get(path))
+        if synced_months is not None:
+            synced_months.add(month)
+
+
+def _sync_on_exit(unsynced):
+    """서버 종료 시 아직 GitHub에 반영되지 않은 변경 사항을 반영합니다."""
+    for session, df_inv, new_records, shas in list(unsynced.values()):
+        try:
+            sync_github(session, df_inv, new_records, shas)
+        except Exception:
+            pass  # 로컬 파일에는 이미 저장되어 있음
+
+
+@st.cache_resource(show_spinner=False)
+def get_unsynced_changes():
+    """
+    세션별로 아직 GitHub에 반영되지 않은 변경 사항을 보관합니다.
+    서버가 종료될 때(atexit) 남은 변경 사항을 반영할 수 있도록 세션 상태 밖에 둡니다.
+    """
+    unsynced = {}
+    atexit.register(_sync_on_exit, unsynced)
+    return unsynced
+
+
+def _current_unsynced_changes(key):
+    """
+    현재 보관소를 돌려주고, 이 세션이 예전 보관소에 남긴 변경 사항은 지웁니다.
+    (캐시가 비워지면 보관소와 atexit 훅이 새로 생기므로, 지우지 않으면 종료 시 옛 기록이 한 번 더 덧붙고
+    나중에 실행되는 옛 훅이 GitHub의 재고를 예전 값으로 덮어씀)
+    """
+    unsynced = get_unsynced_changes()
+    previous = st.session_state.get('unsynced_registry')
+    if previous is not None and previous is not unsynced:
+        previous.pop(key, None)
+    st.session_state['unsynced_registry'] = unsynced
+    return unsynced
+
+
+def _register_unsynced(df_inv):
+    """현재 세션의 미동기화 변경 사항을 서버 종료 시에도 반영할 수 있도록 등록합니다."""
+    key = st.session_state.setdefault('session_key', uuid.uuid4().hex)
+    _current_unsynced_changes(key)[key] = (
+        get_github_session(GITHUB_TOKEN, REPO_NAME), df_inv.copy(),
+        pd.concat(st.session_state['unsynced_rows'], ignore_index=True), st.session_state.setdefault('file_shas', {})
+    )
+
+
+def save_data(df_inv, new_records):
     """
     데이터를 저장합니다.
-    로컬 파일 저장 후, GitHub에도 변경 사항을 Push합니다.
+    로컬 파일에는 바로 저장하고, GitHub에는 쌓아 두었다가 flush_github()로 모아서 Push합니다.
+    거래 기록은 전체를 다시 쓰지 않고 새 거래(new_records)만 덧붙입니다.
     """
     # 1. 로컬 저장 (백업용)
-    df_inv.to_csv(INVENTORY_FILE, index=False)
-    df_hist.to_csv(HISTORY_FILE, index=False)
+    df_inv.to_parquet(INVENTORY_PARQUET, compression='zstd', index=False)
+    new_records.to_csv(HISTORY_FILE, mode='a', header=not os.path.exists(HISTORY_FILE), index=False)
 
     # 2. GitHub 저장 (동기화)
-    repo = get_github_repo()
-    if repo:
-        try:
-            # 인벤토리 업데이트
-            content_inv = df_inv.to_csv(index=False)
-            try:
-                contents = repo.get_contents(INVENTORY_FILE)
-                repo.update_file(contents.path, "Update Inventory (App)", content_inv, contents.sha)
-            except GithubException:  # 파일이 없으면 생성
-                repo.create_file(INVENTORY_FILE, "Create Inventory (App)", content_inv)
-
-            # 거래 기록 업데이트
-            content_hist = df_hist.to_csv(index=False)
-            try:
-                contents = repo.get_contents(HISTORY_FILE)
-                repo.update_file(contents.path, "Update History (App)", content_hist, contents.sha)
-            except GithubException:
-                repo.create_file(HISTORY_FILE, "Create History (App)", content_hist)
-
-            st.toast("✅ 데이터가 GitHub에 성공적으로 저장되었습니다!", icon="☁️")
-        except Exception as e:
-            st.error(f"GitHub 동기화 실패: {e}")
+    session = get_github_session(GITHUB_TOKEN, REPO_NAME)
+    if session:
+        st.session_state.setdefault('unsynced_rows', []).append(new_records)
+        _register_unsynced(df_inv)
+        flush_github()
     else:
         st.toast("데이터가 로컬에 저장되었습니다. (GitHub 미연동)", icon="💾")
 
 
+def flush_github(force=False):
+    """
+    쌓인 변경 사항을 백그라운드에서 GitHub에 한 번에 Push합니다.
+    마지막 Push 후 SYNC_INTERVAL초가 지났거나 force=True일 때만 실행하며,
+    결과는 다음 리런에서 report_sync_results()가 표시하고, 실패한 기록은 다시 쌓여 다음 Push 때 재시도됩니다.
+    """
+    unsynced_rows = st.session_state.get('unsynced_rows')
+    if not unsynced_rows:
+        return
+    last_sync = st.session_state.get('last_sync')
+    if not force and last_sync is not None and time.monotonic() - last_sync < SYNC_INTERVAL:
+        return
+
+    # 캐시가 비워져 보관된 변경 사항이 없으면 세션 상태에서 다시 구성
+    key = st.session_state['session_key']
+    session, df_inv, new_records, shas = _current_unsynced_changes(key).pop(key, None) or (
+        get_github_session(GITHUB_TOKEN, REPO_NAME), st.session_state['df_inventory'].copy(),
+        pd.concat(unsynced_rows, ignore_index=True), st.session_state.setdefault('file_shas', {})
+    )
+    synced_months = set()
+    future = get_sync_executor().submit(sync_github, session, df_inv, new_records, shas, synced_months)
+    st.session_state.setdefault('sync_futures', []).append((future, new_records, synced_months))
+    st.session_state['unsynced_rows'] = []
+    st.session_state['last_sync'] = time.monotonic()
+    st.toast("GitHub에 저장하는 중입니다...", icon="☁️")
+
+
+def report_sync_results():
+    """
+    완료된 백그라운드 GitHub 동기화 결과를 표시하고, 진행 중인 작업만 남깁니다.
+    실패한 작업의 거래 기록 중 아직 덧붙이지 못한 월의 행은 미동기화 목록 맨 앞에 다시 쌓습니다.
+    (거래 기록은 덧붙이기만 하므로 버리면 GitHub에서 영영 빠짐)
+    """
+    pending = []
+    for future, new_records, synced_months in st.session_state.get('sync_futures', []):
+        if not future.done():
+            pending.append((future, new_records, synced_months))
+        elif future.exception() is not None:
+            st.error(f"GitHub 동기화 실패: {future.exception()} (다음 동기화 때 다시 시도합니다)")
+            months = new_records['일시'].dt.strftime('%Y-%m')
+            remaining = new_records[~months.isin(synced_months)]
+            if not remaining.empty:
+                st.session_state.setdefault('unsynced_rows', []).insert(0, remaining)
+                _register_unsynced(st.session_state['df_inventory'])
+        else:
+            st.toast("✅ 데이터가 GitHub에 성공적으로 저장되었습니다!", icon="☁️")
+    st.session_state['sync_futures'] = pending
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def monthly_sales(history_version, _df_hist):
+    """
+    월별/책별 판매(출고) 수량 피벗을 계산합니다. 판매 기록이 없으면 None을 반환합니다.
+    DataFrame 자체 대신 history_version(행 수, 집계에 쓰는 컬럼의 내용 해시)을 캐시 키로 사용해,
+    GitHub에서 기존 기록이 수정되어도 다른 결과로 계산됩니다.
+    """
+    sales = _df_hist[_df_hist['구분'] == '출고']
+    if sales.empty:
+        return None
+    # 월 단위 구간은 문자열 포맷 대신 Period로 만들고, 표시용 문자열 변환은 집계 후에 한 번만
+    months = sales['일시'].dt.to_period('M')
+    pivot = sales.assign(월=months).pivot_table(index='월', columns='책 이름', values='수량', aggfunc='sum',
+                                               fill_value=0, observed=True)
+    pivot.index = pivot.index.astype(str)
+    return pivot
+
+
+def store_data(df_inv, df_hist):
+    """
+    불러온 데이터를 세션 상태에 저장합니다.
+    입출고 처리 시 책을 바로 찾을 수 있도록 '책 이름 -> 행 인덱스' dict와 책 이름 목록도 함께 만듭니다.
+    (책 목록은 로드할 때만 바뀌므로 이때만 생성, 이름이 중복되면 첫 번째 행)
+    """
+    st.session_state['df_inventory'] = df_inv
+    st.session_state['book_idx'] = dict(zip(df_inv['책 이름'].iloc[::-1], df_inv.index[::-1]))
+    st.session_state['book_names'] = df_inv['책 이름'].tolist()  # 입출고 입력의 선택 목록
+    # 불러온 거래 기록은 DataFrame 그대로 두고, 이후 새 거래만 dict 행으로 deque에 쌓음 (appendleft로 O(1) 추가)
+    st.session_state['df_history'] = df_hist
+    st.session_state['history_rows'] = deque()
+
+
+def get_history():
+    """
+    거래 기록 DataFrame을 반환합니다.
+    deque에 쌓인 새 거래만 DataFrame으로 만들어 기존 기록 앞에 한 번에 붙이고, deque는 비웁니다.
+    """
+    rows = st.session_state['history_rows']
+    df_hist = st.session_state['df_history']
+    if rows:
+        new = pd.DataFrame(list(rows), columns=HISTORY_COLUMNS).astype({**HISTORY_DTYPES, '일시': 'datetime64[ns]'})
+        rows.clear()
+        # category 범주가 다르면 concat 결과가 object가 되므로, 기존 범주 뒤에 새 값만 추가해 맞춤
+        for col, dtype in HISTORY_DTYPES.items():
+            if dtype == 'category':
+                missing = new[col].cat.categories.difference(df_hist[col].cat.categories)
+                df_hist[col] = df_hist[col].cat.add_categories(missing)
+                new[col] = new[col].astype(df_hist[col].dtype)
+        df_hist = pd.concat([new, df_hist], ignore_index=True)
+        st.session_state['df_history'] = df_hist
+    return df_hist
+
+
 # 데이터 로드 실행
 if 'data_loaded' not in st.session_state:
-    st.session_state['df_inventory'], st.session_state['df_history'] = load_data()
+    store_data(*load_data())
     st.session_state['data_loaded'] = True
 
+# 다른 화면으로 이동하는 등 리런될 때도 동기화 간격이 지났으면 쌓인 변경 사항을 Push
+flush_github()
+report_sync_results()
+
 # 편의를 위해 세션 상태의 데이터를 변수에 할당 (참조)
 df_inventory = st.session_state['df_inventory']
-df_history = st.session_state['df_history']
 
 # --------------------------------------------------------------------------------
 # 3. 사이드바 메뉴
@@ -145,9 +505,24 @@ with st.sidebar:
     st.header("MENU")
     choice = st.radio("이동", ["입출고 입력", "현재 재고", "거래 기록", "알림", "리포트 및 분석"])
     st.divider()
+    sync_status = st.container()  # 동기화 상태는 이번 입력까지 반영해 페이지 끝에서 채움
     if st.button("데이터 새로고침 (GitHub 불러오기)"):
-        st.session_state['df_inventory'], st.session_state['df_history'] = load_data()
-        st.experimental_rerun()
+        # 쌓인 변경 사항을 먼저 Push하고 끝날 때까지(최대 GITHUB_TIMEOUT초) 기다린 뒤 불러옴
+        flush_github(force=True)
+        futures = [future for future, _, _ in st.session_state.get('sync_futures', [])]
+        wait(futures, timeout=GITHUB_TIMEOUT)
+        report_sync_results()
+        # 아직 반영되지 않았거나 실패한 변경 사항이 있으면 불러온 데이터로 덮어쓰지 않음
+        # (GitHub의 재고에는 그 수량 변화가 없어 다음 Push 때 재고와 거래 기록이 어긋남)
+        if st.session_state.get('unsynced_rows') or st.session_state.get('sync_futures'):
+            st.warning("GitHub에 아직 반영되지 않은 변경 사항이 있어 새로고침하지 않았습니다. 잠시 후 다시 시도해 주세요.")
+        else:
+            data = load_data(refresh=True)
+            if data is None:
+                st.toast("GitHub의 데이터가 바뀌지 않았습니다.", icon="✅")
+            else:
+                store_data(*data)
+                st.rerun()
 
 # --------------------------------------------------------------------------------
 # 4. 기능 구현
@@ -164,8 +539,7 @@ if choice == "입출고 입력":
             client = st.text_input("거래처 (서점명/인쇄소 등)")
 
         with col2:
-            book_list = df_inventory['책 이름'].tolist()
-            selected_book = st.selectbox("책 이름", book_list)
+            selected_book = st.selectbox("책 이름", st.session_state['book_names'])
             quantity = st.number_input("수량", min_value=1, value=10)
 
         submitted = st.form_submit_button("입력 완료")
@@ -175,8 +549,10 @@ if choice == "입출고 입력":
                 st.warning("거래처를 입력해주세요.")
             else:
                 # 데이터 처리 로직
-                book_idx = df_inventory[df_inventory['책 이름'] == selected_book].index[0]
+                book_idx = st.session_state['book_idx'][selected_book]
                 current_qty = df_inventory.at[book_idx, '현재 수량']
+                if pd.isna(current_qty):  # 수량 칸이 비어 있으면 0권으로 간주
+                    current_qty = 0
                 price = df_inventory.at[book_idx, '가격']
 
                 new_qty = current_qty
@@ -193,22 +569,21 @@ if choice == "입출고 입력":
                 # 업데이트
                 df_inventory.at[book_idx, '현재 수량'] = new_qty
 
-                new_record = pd.DataFrame([{
-                    '일시': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                new_row = {
+                    '일시': datetime.now().replace(microsecond=0),
                     '거래처': client,
                     '책 이름': selected_book,
                     '구분': tx_type,
                     '수량': quantity,
                     '가격': price
-                }])
+                }
 
-                # 최신 기록을 위로 쌓기 위해 concat 순서 조정
-                df_history = pd.concat([new_record, df_history], ignore_index=True)
+                # 최신 기록을 위로 쌓기 위해 맨 앞에 추가
+                st.session_state['history_rows'].appendleft(new_row)
 
                 # 세션 상태 업데이트 및 저장
                 st.session_state['df_inventory'] = df_inventory
-                st.session_state['df_history'] = df_history
-                save_data(df_inventory, df_history)
+                save_data(df_inventory, pd.DataFrame([new_row]))
 
                 st.success(f"처리 완료! '{selected_book}' 재고: {current_qty} -> {new_qty}")
 
@@ -221,8 +596,9 @@ elif choice == "현재 재고":
         search_term = st.text_input("검색 (책 이름 또는 ISBN)", placeholder="검색어를 입력하세요...")
 
     if search_term:
-        mask = df_inventory['책 이름'].astype(str).str.contains(search_term) | df_inventory['ISBN'].astype(
-            str).str.contains(search_term)
+        # 정규식이 아닌 단순 부분 문자열로 검색 (ISBN은 로드 시 이미 문자열 타입)
+        mask = (df_inventory['책 이름'].str.contains(search_term, case=False, regex=False, na=False)
+                | df_inventory['ISBN'].str.contains(search_term, case=False, regex=False, na=False))
         result = df_inventory[mask]
     else:
         result = df_inventory
@@ -241,15 +617,17 @@ elif choice == "현재 재고":
 # [기능 3] 거래 기록
 elif choice == "거래 기록":
     st.subheader("📜 전체 거래 내역")
+    df_history = get_history()
 
-    # 최신순 정렬 (일시 기준 내림차순)
+    # 거래 기록은 이미 최신순으로 정렬되어 있으므로 정렬 없이 최근 기록만 표시
     if not df_history.empty:
-        df_display = df_history.sort_values(by='일시', ascending=False)
         st.dataframe(
-            df_display,
+            df_history.head(HISTORY_DISPLAY_ROWS),
             use_container_width=True,
             hide_index=True
         )
+        if len(df_history) > HISTORY_DISPLAY_ROWS:
+            st.caption(f"최근 {HISTORY_DISPLAY_ROWS:,}건만 표시합니다. (전체 {len(df_history):,}건)")
     else:
         st.info("아직 거래 기록이 없습니다.")
 
@@ -257,16 +635,18 @@ elif choice == "거래 기록":
 elif choice == "알림":
     st.subheader("🔔 안전 재고 미달 알림")
 
-    alert_list = []
-    for idx, row in df_inventory.iterrows():
-        if row['현재 수량'] <= row['안전 재고']:
-            alert_list.append(row)
-
-    if alert_list:
-        for item in alert_list:
-            st.error(f"⚠️ **[재고 부족]** '{item['책 이름']}'")
-            st.write(f"- 현재 수량: **{item['현재 수량']}권** (안전 재고: {item['안전 재고']}권)")
-            st.write(f"- ISBN: {item['ISBN']}")
+    # 안전 재고 이하인 책을 한 번에 필터링 (행 단위 반복 없이 벡터 비교)
+    # (빈 칸은 NaN으로 바꿔 비교 결과가 False가 되도록 함)
+    qty = df_inventory['현재 수량'].to_numpy(dtype=float, na_value=np.nan)
+    safety_qty = df_inventory['안전 재고'].to_numpy(dtype=float, na_value=np.nan)
+    alert = df_inventory.loc[qty <= safety_qty]
+
+    if not alert.empty:
+        columns = ['책 이름', '현재 수량', '안전 재고', 'ISBN']
+        for name, cur_qty, safety, isbn in alert[columns].itertuples(index=False, name=None):
+            st.error(f"⚠️ **[재고 부족]** '{name}'")
+            st.write(f"- 현재 수량: **{cur_qty}권** (안전 재고: {safety}권)")
+            st.write(f"- ISBN: {isbn}")
             st.divider()
     else:
         st.success("✅ 모든 책의 재고가 안전 재고 이상입니다.")
@@ -274,38 +654,35 @@ elif choice == "알림":
 # [기능 5] 리포트 및 분석
 elif choice == "리포트 및 분석":
     st.subheader("📊 리포트 및 분석")
+    df_history = get_history()
 
     tab1, tab2, tab3 = st.tabs(["📉 월간 판매량", "💰 재고 자산 평가", "🔄 거래처별 반품률"])
 
     with tab1:
         if not df_history.empty:
-            df_hist_copy = df_history.copy()
-            df_hist_copy['일시'] = pd.to_datetime(df_hist_copy['일시'])
-            df_hist_copy['월'] = df_hist_copy['일시'].dt.strftime('%Y-%m')
-
-            # 출고(판매) 데이터만
-            sales_df = df_hist_copy[df_hist_copy['구분'] == '출고']
+            # 거래 기록이 바뀌었을 때만 다시 계산
+            content_hash = pd.util.hash_pandas_object(df_history[['일시', '책 이름', '구분', '수량']], index=False)
+            history_version = (len(df_history), int(content_hash.sum()))
+            monthly = monthly_sales(history_version, df_history)
 
-            if not sales_df.empty:
-                monthly_sales = sales_df.pivot_table(index='월', columns='책 이름', values='수량', aggfunc='sum',
-                                                     fill_value=0)
-                st.bar_chart(monthly_sales)
+            if monthly is not None:
+                st.bar_chart(monthly)
                 st.write("상세 데이터:")
-                st.dataframe(monthly_sales)
+                st.dataframe(monthly)
             else:
                 st.info("판매(출고) 데이터가 없습니다.")
         else:
             st.info("거래 데이터가 없습니다.")
 
     with tab2:
-        df_inv_copy = df_inventory.copy()
-        df_inv_copy['총액'] = df_inv_copy['현재 수량'] * df_inv_copy['가격']
-        total_asset = df_inv_copy['총액'].sum()
+        # 전체 복사 없이 필요한 컬럼만 골라 총액 컬럼을 덧붙임
+        total = df_inventory['현재 수량'].astype('Int64') * df_inventory['가격']  # int32 overflow 방지
+        total_asset = int(total.sum())
 
         st.metric("총 재고 자산", f"{total_asset:,.0f} 원")
 
         st.dataframe(
-            df_inv_copy[['책 이름', '현재 수량', '가격', '총액']],
+            df_inventory[['책 이름', '현재 수량', '가격']].assign(총액=total),
             column_config={
                 "가격": st.column_config.NumberColumn(format="%d원"),
                 "총액": st.column_config.NumberColumn(format="%d원"),
@@ -315,17 +692,20 @@ elif choice == "리포트 및 분석":
 
     with tab3:
         if not df_history.empty:
-            # 거래처별 집계
-            df_client = df_history.groupby(['거래처', '구분'])['수량'].sum().unstack(fill_value=0)
+            # 거래처별 집계 (category 코드로 그룹화, 실제 존재하는 조합만 / 정렬 생략)
+            df_client = df_history.groupby(['거래처', '구분'], observed=True, sort=False)['수량'].sum().unstack(
+                fill_value=0)
+            # 구분 컬럼이 CategoricalIndex이면 '반품률(%)' 같은 새 컬럼을 추가할 수 없으므로 일반 문자열로 변환
+            df_client.columns = df_client.columns.astype(str)
 
             if '출고' in df_client.columns:
                 if '반품' not in df_client.columns:
                     df_client['반품'] = 0
 
-                # 반품률 계산
-                df_client['반품률(%)'] = df_client.apply(
-                    lambda x: (x['반품'] / x['출고'] * 100) if x['출고'] > 0 else 0, axis=1
-                )
+                # 반품률 계산 (출고가 0이면 0%)
+                ret = df_client['반품'].to_numpy(dtype=float, na_value=0.0)
+                sold = df_client['출고'].to_numpy(dtype=float, na_value=0.0)
+                df_client['반품률(%)'] = np.divide(ret * 100.0, sold, out=np.zeros_like(ret), where=sold > 0)
 
                 st.dataframe(
                     df_client[['출고', '반품', '반품률(%)']].style.format({'반품률(%)': "{:.2f}%"}),
@@ -334,4 +714,13 @@ elif choice == "리포트 및 분석":
             else:
                 st.info("출고 데이터가 부족하여 반품률을 계산할 수 없습니다.")
         else:
-            st.info("거래 데이터가 없습니다.")
\ No newline at end of file
+            st.info("거래 데이터가 없습니다.")
+
+# 사이드바: GitHub 미동기화 건수
+with sync_status:
+    unsynced_count = sum(len(rows) for rows in st.session_state.get('unsynced_rows', []))
+    if unsynced_count:
+        st.caption(f"☁️ GitHub 미동기화: {unsynced_count}건")
+        if st.button("지금 동기화"):
+            flush_github(force=True)
+            st.rerun()